@@ -3,8 +3,10 @@ import asyncio
 from browser_use.agent.views import ActionResult
 from browser_use.browser.context import BrowserContext as BrowserUseBrowserContext
 from browser_use.controller.service import Controller
+from playwright.async_api import Error as PlaywrightError, Page
 from pydantic import BaseModel
 
+from app.agent.utils import OCR_SCROLL_SCREENSHOTS, OCR_TILE_HEIGHT, OCR_TILE_OVERLAP, SCREENSHOT_JPEG_QUALITY
 from app.files import FileUtils
 from app.llm import LLMModel
 from app.logger import base_logger
@@ -15,6 +17,9 @@ logger = base_logger.getChild(__name__)
 
 browser_controller = Controller()
 
+# Playwright waits 30 seconds by default for an element to become fillable, fall back to typing much sooner
+FILL_TIMEOUT_MS = 2000
+
 
 class ActionInputTextCoordinatesParam(BaseModel):
     x: int
@@ -22,12 +27,27 @@ class ActionInputTextCoordinatesParam(BaseModel):
     text: str
 
 
+async def _fill_focused_element(page: Page, text: str) -> bool:
+    """Fill the focused element in one call instead of typing it key by key, returns False if it can't be filled."""
+    handle = await page.evaluate_handle("document.activeElement")
+    try:
+        element = handle.as_element()
+        if element is None or not await element.is_editable():
+            return False
+        await element.fill(text, timeout=FILL_TIMEOUT_MS)
+    except PlaywrightError:
+        return False
+    finally:
+        await handle.dispose()
+    return True
+
+
 @browser_controller.action(
     """Input text into an input element at the specific coordinates:
 This is used as a fallback when the input_text action fails with an Action error such as: 'Action error: Error executing action input_text'
 x: The x (pixels from the left edge) coordinates to move the mouse to. Required to determine where to click.
 y: The y (pixels from the top edge) coordinates to move the mouse to. Required to determine where to click.
-text: The text to input into the page.""",
+text: The text to input into the page. If the clicked element is a text field its current value is replaced with this text.""",
     param_model=ActionInputTextCoordinatesParam,
     requires_browser=True,
 )
@@ -41,8 +61,9 @@ async def input_text_using_coordinates(
     page = await browser.get_current_page()
     await page.mouse.move(x, y)
     await page.mouse.click(x, y, button="left")
-    for chunk in chunkify(text, 50):
-        await page.keyboard.type(chunk)
+    if not await _fill_focused_element(page, text):
+        for chunk in chunkify(text, 200):
+            await page.keyboard.type(chunk)
     msg = f"Typed '{text}' at coordinates ({x}, {y})"
     logger.info(msg)
     return ActionResult(extracted_content=msg, include_in_memory=True)
@@ -69,28 +90,56 @@ class ActionReadWebPageContentParam(BaseModel):
     pass
 
 
-@browser_controller.action(
-    "Read web page content",
-    param_model=None,
-    requires_browser=True,
-)
-async def read_page_content(browser: BrowserUseBrowserContext) -> ActionResult:
+async def _take_scrolling_screenshots(page: Page) -> list[str]:
+    """Screenshot the page one viewport at a time, scrolling down until the end of the page."""
     # NOTE: evaluate may* not work in headless mode
-    page = await browser.get_current_page()
     screenshots = []
 
     last_height = await page.evaluate("document.documentElement.scrollHeight")
     while True:
-        screenshots.append(FileUtils.encode_image_to_base64(await page.screenshot()))
-        await page.keyboard.press("PageDown")
-        await page.wait_for_load_state()
-        new_height = await page.evaluate("document.documentElement.scrollHeight")
-        current_position = await page.evaluate("window.scrollY")
-        if current_position + await page.evaluate("window.innerHeight") >= last_height:
+        screenshot = await page.screenshot(type="jpeg", quality=SCREENSHOT_JPEG_QUALITY)
+        screenshots.append(FileUtils.encode_image_to_base64(screenshot))
+        # Scroll and read the page metrics in a single round trip. The scroll is instant so scrollY is
+        # already final on pages with `scroll-behavior: smooth`, and a programmatic scroll doesn't
+        # navigate so there is no load state to wait for like there was after pressing PageDown.
+        new_height, current_position, viewport_height = await page.evaluate(
+            """() => {
+                window.scrollBy({top: window.innerHeight, behavior: "instant"});
+                return [document.documentElement.scrollHeight, window.scrollY, window.innerHeight];
+            }""",
+        )
+        if current_position + viewport_height >= last_height:
             break
         last_height = new_height
+    return screenshots
+
+
+@browser_controller.action(
+    "Read web page content",
+    param_model=ActionReadWebPageContentParam,
+    requires_browser=True,
+)
+async def read_page_content(browser: BrowserUseBrowserContext) -> ActionResult:
+    page = await browser.get_current_page()
+    if OCR_SCROLL_SCREENSHOTS:
+        screenshots = await _take_scrolling_screenshots(page)
+    else:
+        # A single full page screenshot, split into tiles the OCR model can read at full resolution
+        full_page = await page.screenshot(full_page=True, type="jpeg", quality=SCREENSHOT_JPEG_QUALITY)
+        tiles = await asyncio.to_thread(
+            FileUtils.split_image_into_tiles,
+            full_page,
+            tile_height=OCR_TILE_HEIGHT,
+            overlap=OCR_TILE_OVERLAP,
+            quality=SCREENSHOT_JPEG_QUALITY,
+        )
+        screenshots = [FileUtils.encode_image_to_base64(tile) for tile in tiles]
     response = await LLMModel.do_ocr(
         images=screenshots,
-        prompt="You are a webpage reader. The images are screenshots of a webpage. Read the webpage and extract the text content.",
+        prompt=(
+            "You are a webpage reader. The images are consecutive, top to bottom parts of a single webpage and "
+            "neighbouring images overlap, so text at the bottom of one image may repeat at the top of the next. "
+            "Read the webpage and extract the text content once, in reading order, without repeating the overlapped text."
+        ),
     )
     return ActionResult(extracted_content=response, include_in_memory=True)
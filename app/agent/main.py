@@ -1,16 +1,35 @@
+import asyncio
+from dataclasses import replace
 from datetime import UTC, datetime
-from typing import TypedDict, cast
+from typing import ClassVar, Literal, TypedDict, cast
 
-from browser_use import Agent, AgentHistoryList, Browser, BrowserConfig
+from browser_use import Agent, Browser, BrowserConfig
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
-from browser_use.browser.views import TabInfo
 
 from app.agent.browser_controller import browser_controller
-from app.agent.utils import AGENT_LOG_FOLDER, create_system_prompt_class
+from app.agent.utils import AGENT_LOG_FOLDER, BROWSER_POOL_SIZE, create_system_prompt_class
 from app.files import FileUtils, GIFParams, HistoryMedia
 from app.llm import LLMModel
 from app.logger import base_logger
-from app.model_types import AnthropicModelName
+from app.model_types import AnthropicModelName, ModelProviders
+
+# Runs with fewer steps than this don't get history media
+MIN_HISTORY_MEDIA_STEPS = 2
+# Short runs only get a GIF, an MP4 of a handful of frames isn't worth the encoder start up
+MAX_GIF_ONLY_FRAMES = 5
+
+BROWSER_CONFIG = BrowserConfig(headless=False)
+# Settings shared by every run, the per run file paths are filled in by WebExplorerAgent.run
+BASE_BROWSER_CONTEXT_CONFIG = BrowserContextConfig(
+    minimum_wait_page_load_time=3.0,
+    wait_for_network_idle_page_load_time=3.0,
+    maximum_wait_page_load_time=10.0,
+    # browser_window_size={"width": 1280, "height": 1100},
+    # NOTE: using this configuration 1024x768 made it easier to type and stuff like that.
+    browser_window_size={"width": 1024, "height": 768},
+    locale="en-GB",
+    highlight_elements=False,
+)
 
 
 class Output(TypedDict):
@@ -31,6 +50,10 @@ class AgentHistoryMedia(TypedDict):
 
 
 class WebExplorerAgent:
+    # Idle browsers shared by every agent in the process, launching Chromium on every run is slow
+    _browser_pool: ClassVar[asyncio.Queue[Browser] | None] = None
+    _browser_pool_loop: ClassVar[asyncio.AbstractEventLoop | None] = None
+
     def __init__(self) -> None:
         run_id = datetime.now(UTC).strftime("%Y-%m-%d_%H-%M")
         self.logger = base_logger.getChild(self.__class__.__name__)
@@ -45,20 +68,69 @@ class WebExplorerAgent:
         self.llm_model = LLMModel(model_name=AnthropicModelName.CLAUDE_3_5_LATEST)
         self.model_config = self.llm_model.llm_model_configuration
 
+    @classmethod
+    def _get_browser_pool(cls) -> asyncio.Queue[Browser]:
+        loop = asyncio.get_running_loop()
+        if cls._browser_pool is None or cls._browser_pool_loop is not loop:
+            # Pooled browsers hold Playwright connections bound to the loop that started them, browsers left
+            # over from a previous loop can't be used or closed from this one
+            cls._browser_pool = asyncio.Queue(maxsize=BROWSER_POOL_SIZE)
+            cls._browser_pool_loop = loop
+        return cls._browser_pool
+
+    @staticmethod
+    def _is_browser_connected(browser: Browser) -> bool:
+        """Return False if the browser was started and has since gone away, e.g. its window was closed."""
+        return browser.playwright_browser is None or browser.playwright_browser.is_connected()
+
+    @classmethod
+    async def _acquire_browser(cls) -> Browser:
+        """Take an idle browser from the pool, or create a new one if none is available."""
+        pool = cls._get_browser_pool()
+        while not pool.empty():
+            browser = pool.get_nowait()
+            if cls._is_browser_connected(browser):
+                return browser
+            await browser.close()
+        return Browser(config=BROWSER_CONFIG)
+
+    @classmethod
+    async def _release_browser(cls, browser: Browser) -> None:
+        """Return a browser to the pool, closing it if pooling is off, it is disconnected or the pool is full."""
+        # asyncio.Queue treats a maxsize of 0 as unbounded, so pooling has to be turned off here
+        if BROWSER_POOL_SIZE == 0 or not cls._is_browser_connected(browser):
+            await browser.close()
+            return
+        try:
+            cls._get_browser_pool().put_nowait(browser)
+        except asyncio.QueueFull:
+            await browser.close()
+
+    @classmethod
+    async def close_browser_pool(cls) -> None:
+        """Close every idle browser in the pool, call this before the event loop shuts down."""
+        pool = cls._get_browser_pool()
+        while not pool.empty():
+            await pool.get_nowait().close()
+
     def _create_browser_agent(self, *, prompt: str, instruction: str, browser_context: BrowserContext) -> Agent:
         return Agent(
             task=instruction,
             llm=self.llm_model.model,
             save_conversation_path=self.CONVERSATION_FILE,
             browser_context=browser_context,
-            system_prompt_class=create_system_prompt_class(prompt=prompt),
+            system_prompt_class=create_system_prompt_class(
+                prompt,
+                cache_prompt=self.model_config["provider"] == ModelProviders.ANTHROPIC,
+            ),
             generate_gif=False,  # Generate the gif manually in the _create_history_media method
             controller=browser_controller,
         )
 
-    async def _take_screenshot(self, *, context: BrowserContext) -> str:
+    async def _get_viewport_size(self, *, context: BrowserContext) -> tuple[int, int]:
         page = await context.get_current_page()
-        return await page.screenshot()
+        viewport = page.viewport_size or BASE_BROWSER_CONTEXT_CONFIG.browser_window_size
+        return viewport["width"], viewport["height"]
 
     async def _create_history_media(self, *, title: str, context: BrowserContext) -> HistoryMedia | None:
         """Create a GIF from the browser agent's history."""
@@ -66,73 +138,88 @@ class WebExplorerAgent:
             msg = "Browser agent is not initialized"
             self.logger.error(msg)
             raise ValueError(msg)
-        screenshot_image = await self._take_screenshot(context=context)
-        return FileUtils.create_media_from_history_list(
-            history_list=self.browser_agent.history,
-            screenshots_to_append=[screenshot_image],
+        history_list = self.browser_agent.history
+        if len(history_list.history) < MIN_HISTORY_MEDIA_STEPS:
+            # Nothing worth replaying, skip the encoding
+            return None
+        # The closing frame is blank, it only needs the size of the page
+        viewport_size = await self._get_viewport_size(context=context)
+        # The title frame and the closing frame are added to the history frames
+        frame_count = len(history_list.history) + 2
+        output_format: list[Literal["gif", "mp4"]] = ["gif"] if frame_count <= MAX_GIF_ONLY_FRAMES else ["mp4", "gif"]
+        # Encoding is CPU bound, run it in a worker thread so it doesn't block the event loop
+        return await asyncio.to_thread(
+            FileUtils.create_media_from_history_list,
+            history_list=history_list,
+            closing_frame_sizes=[viewport_size],
             filename=self.AGENT_HISTORY_FILE_NAME,
-            output_format=["mp4", "gif"],
+            output_format=output_format,
             params=GIFParams(
                 title_text=title,
                 use_logo=False,
             ),
         )
 
-    def _get_open_tabs(self, *, history: AgentHistoryList) -> list[TabInfo]:
-        return history.history[-1].state.tabs
-
-    def _read_agent_cookies(self) -> list[dict] | None:
+    async def _read_agent_cookies(self) -> list[dict] | None:
         try:
-            return cast(list[dict], FileUtils.read_json_file(self.COOKIES_FILE))
+            return cast(list[dict], await asyncio.to_thread(FileUtils.read_json_file, self.COOKIES_FILE))
         except Exception:
             msg = f"Error reading cookies from file: {self.COOKIES_FILE}"
             self.logger.error(msg)  # noqa: TRY400
         return None
 
-    def _write_cookies_to_file(self, *, cookies: list[dict] | None) -> None:
+    async def _write_cookies_to_file(self, *, cookies: list[dict] | None) -> None:
         if cookies:
-            FileUtils.write_data_to_file(self.COOKIES_FILE, cookies)
+            await asyncio.to_thread(FileUtils.write_data_to_file, self.COOKIES_FILE, cookies)
 
     async def run(self, *, prompt: str, title: str, instruction: str) -> Output:
-        browser = Browser(config=BrowserConfig(headless=False))
+        browser = await self._acquire_browser()
 
         output: Output
         error: str | None = None
-        browser_context_config = BrowserContextConfig(
-            minimum_wait_page_load_time=3.0,
-            wait_for_network_idle_page_load_time=3.0,
-            maximum_wait_page_load_time=10.0,
-            # browser_window_size={"width": 1280, "height": 1100},
-            # NOTE: using this configuration 1024x768 made it easier to type and stuff like that.
-            browser_window_size={"width": 1024, "height": 768},
+        browser_context_config = replace(
+            BASE_BROWSER_CONTEXT_CONFIG,
             cookies_file=self.COOKIES_FILE,
             trace_path=self.TRACE_FOLDER,
             save_recording_path=self.AGENT_RECORDING_FOLDER,
-            locale="en-GB",
-            highlight_elements=False,
         )
-        async with await browser.new_context(config=browser_context_config) as context:
-            self.browser_agent = self._create_browser_agent(
-                prompt=prompt,
-                instruction=instruction,
-                browser_context=context,
-            )
-            browser_agent_history = await self.browser_agent.run()
-            browser_agent_cookies = self._read_agent_cookies()
-            agent_history_media = await self._create_history_media(context=context, title=title)
-            output_message = browser_agent_history.final_result()
-            error = browser_agent_history.history[-1].result[-1].error
-
-            output = Output(
-                browser_agent_history_gif_url=agent_history_media.get("gif_url"),
-                browser_agent_history_gif_video_url=agent_history_media.get("gif_video_url"),
-                browser_agent_history_video_recording_url=agent_history_media.get("video_recording_url"),
-                message=output_message,
-                error=error,
-                image_url=agent_history_media.get("screenshot_url"),
-                browser_agent_cookies=browser_agent_cookies,
-            )
+        try:
+            async with await browser.new_context(config=browser_context_config) as context:
+                self.browser_agent = self._create_browser_agent(
+                    prompt=prompt,
+                    instruction=instruction,
+                    browser_context=context,
+                )
+                browser_agent_history = await self.browser_agent.run()
+                try:
+                    async with asyncio.TaskGroup() as task_group:
+                        cookies_task = task_group.create_task(self._read_agent_cookies())
+                        history_media_task = task_group.create_task(
+                            self._create_history_media(context=context, title=title),
+                        )
+                except ExceptionGroup as error_group:
+                    # Raise the original error, callers don't expect an ExceptionGroup from run
+                    raise error_group.exceptions[0]  # noqa: B904
+                browser_agent_cookies = cookies_task.result()
+                agent_history_media = history_media_task.result()
+                output_message = browser_agent_history.final_result()
+                error = browser_agent_history.history[-1].result[-1].error
+
+                history_media = agent_history_media or HistoryMedia(gif=None, mp4=None)
+
+                output = Output(
+                    browser_agent_history_gif_url=history_media["gif"],
+                    browser_agent_history_gif_video_url=history_media["mp4"],
+                    browser_agent_history_video_recording_url=None,
+                    message=output_message,
+                    error=error,
+                    image_url=None,
+                    browser_agent_cookies=browser_agent_cookies,
+                )
+        except Exception:
+            await browser.close()  # don't hand a possibly broken browser to the next run
+            raise
 
         self.logger.info(output)
-        await browser.close()
+        await self._release_browser(browser)
         return output
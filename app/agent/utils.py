@@ -1,11 +1,35 @@
+import os
+from functools import lru_cache
+
 from browser_use import SystemPrompt
+from langchain_core.messages import SystemMessage
 
 LOG_FOLDER = "logs"
 
 AGENT_LOG_FOLDER = f"{LOG_FOLDER}/agent"
 
+# Number of idle browsers kept alive between runs, 0 closes every browser after its run
+BROWSER_POOL_SIZE = int(os.getenv("WEB_EXPLORER_BROWSER_POOL", "1"))
+if BROWSER_POOL_SIZE < 0:
+    msg = f"WEB_EXPLORER_BROWSER_POOL must be 0 or more, got {BROWSER_POOL_SIZE}"
+    raise ValueError(msg)
+
+# Read pages for OCR by scrolling a viewport at a time instead of one full page screenshot
+OCR_SCROLL_SCREENSHOTS = os.getenv("WEB_EXPLORER_OCR_SCROLL_SCREENSHOTS", "false").lower() == "true"
+OCR_TILE_HEIGHT = 1024
+# Pixels shared by consecutive tiles, so text on a tile edge is whole in one of them
+OCR_TILE_OVERLAP = 160
+SCREENSHOT_JPEG_QUALITY = 80
+
+
+@lru_cache(maxsize=128)
+def create_system_prompt_class(prompt: str, /, *, cache_prompt: bool = False) -> type[SystemPrompt]:
+    """Create a system prompt class with `prompt` as its most important rule.
+
+    With `cache_prompt` the system message is marked for Anthropic prompt caching, it is resent unchanged on every
+    step of a run so only the first step pays for its input tokens.
+    """
 
-def create_system_prompt_class(prompt: str) -> type[SystemPrompt]:
     class CustomSystemPrompt(SystemPrompt):
         def important_rules(self) -> str:
             existing_rules = super().important_rules()
@@ -15,4 +39,12 @@ def create_system_prompt_class(prompt: str) -> type[SystemPrompt]:
 """
             return f"{existing_rules}\n{custom_rule}"
 
+        def get_system_message(self) -> SystemMessage:
+            system_message = super().get_system_message()
+            if not cache_prompt:
+                return system_message
+            return SystemMessage(
+                content=[{"type": "text", "text": system_message.content, "cache_control": {"type": "ephemeral"}}],
+            )
+
     return CustomSystemPrompt
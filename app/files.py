@@ -1,19 +1,54 @@
+from __future__ import annotations
+
 import base64
 import io
-import json
+import shutil
+import subprocess
+from functools import cache, lru_cache
 from pathlib import Path
-from typing import Any, Literal, TypedDict
+from typing import TYPE_CHECKING, Any, Literal, TypedDict
 
-import cv2
-import numpy as np
-from browser_use.agent.views import AgentHistoryList
-from PIL import Image, ImageDraw, ImageFont
+import orjson
 from pydantic import HttpUrl, TypeAdapter
 
 from app.logger import base_logger
 
+# Imaging and video libraries are imported where they are used, so importing this module stays cheap
+if TYPE_CHECKING:
+    import numpy as np
+    from browser_use.agent.views import AgentHistory, AgentHistoryList
+    from PIL import Image, ImageFont
+
 logger = base_logger.getChild(__name__)
 
+FONT_OPTIONS = ["Helvetica", "Arial", "DejaVuSans", "Verdana"]  # in order of preference
+
+
+@lru_cache(maxsize=32)
+def _truetype(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Load a TrueType font, parsing each (path, size) pair only once per process."""
+    from PIL import ImageFont
+
+    return ImageFont.truetype(path, size)
+
+
+@lru_cache(maxsize=4096)
+def _text_width(font: ImageFont.FreeTypeFont | ImageFont.ImageFont, text: str) -> float:
+    """Return the rendered width of `text`, memoized per font and bounded so goal text can't grow it forever."""
+    return font.getlength(text)
+
+
+@cache
+def _preferred_font_family() -> str | None:
+    """Return the first available font from FONT_OPTIONS, probing the system only once."""
+    for font_name in FONT_OPTIONS:
+        try:
+            _truetype(font_name, 10)
+        except OSError:
+            continue
+        return font_name
+    return None
+
 
 class Font(TypedDict):
     regular: ImageFont.ImageFont | ImageFont.FreeTypeFont
@@ -38,15 +73,6 @@ class HistoryMedia(TypedDict):
 
 
 class FileUtils:
-    @staticmethod
-    def _pil_to_cv2(image: Image.Image) -> np.ndarray:
-        """Convert PIL Image to CV2 format."""
-        # Convert PIL image to RGB if it's not
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        # Convert to numpy array and swap RGB to BGR
-        return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-
     @staticmethod
     def _load_font(
         *,
@@ -54,50 +80,36 @@ class FileUtils:
         title_font_size: int = 22,
         goal_font_size: int = 17,
     ) -> Font:
-        regular_font = ImageFont.load_default()
-        title_font = ImageFont.load_default()
-        goal_font = regular_font
+        from PIL import ImageFont
 
-        try:
-            font_options = ["Helvetica", "Arial", "DejaVuSans", "Verdana"]  # in order of preference
-            font_loaded = False
-
-            for font_name in font_options:
-                try:
-                    regular_font = ImageFont.truetype(font_name, regular_font_size)
-                    title_font = ImageFont.truetype(font_name, title_font_size)
-                    goal_font = ImageFont.truetype(font_name, goal_font_size)
-                    font_loaded = True
-                    break
-                except OSError:
-                    continue
-
-            if not font_loaded:
-                msg = "No preferred fonts found"
-                raise OSError(msg)
-        except OSError:
+        font_name = _preferred_font_family()
+        if font_name is None:
             regular_font = ImageFont.load_default()
             title_font = ImageFont.load_default()
             goal_font = regular_font
+        else:
+            regular_font = _truetype(font_name, regular_font_size)
+            title_font = _truetype(font_name, title_font_size)
+            goal_font = _truetype(font_name, goal_font_size)
         return Font(regular=regular_font, title=title_font, goal=goal_font)
 
     @staticmethod
     def _wrap_text(*, text: str, font: ImageFont.FreeTypeFont | ImageFont.ImageFont, max_width: int) -> str:
         """Wrap text to fit within a given width."""
-        words = text.split()
+        space_width = _text_width(font, " ")
         lines = []
-        current_line = []
-        for word in words:
-            current_line.append(word)
-            line = " ".join(current_line)
-            bbox = font.getbbox(line)
-            if bbox[2] > max_width:
-                if len(current_line) == 1:
-                    lines.append(current_line.pop())
-                else:
-                    current_line.pop()
-                    lines.append(" ".join(current_line))
-                    current_line = [word]
+        current_line: list[str] = []
+        current_width = 0.0
+        for word in text.split():
+            word_width = _text_width(font, word)
+            line_width = current_width + space_width + word_width if current_line else word_width
+            if line_width > max_width and current_line:
+                lines.append(" ".join(current_line))
+                current_line = [word]
+                current_width = word_width
+            else:
+                current_line.append(word)
+                current_width = line_width
         if current_line:
             lines.append(" ".join(current_line))
         return "\n".join(lines)
@@ -106,14 +118,14 @@ class FileUtils:
     def _create_frame(
         *,
         text: str,
-        screenshot: str,
+        size: tuple[int, int],
         font: ImageFont.ImageFont | ImageFont.FreeTypeFont,
         logo: Image.Image | None,
         line_spacing: float = 1.3,
     ) -> Image.Image:
-        img_bytes = FileUtils.decode_image_from_base64(screenshot)
-        template = Image.open(io.BytesIO(img_bytes))
-        image = Image.new("RGB", template.size, (0, 0, 0))
+        from PIL import Image, ImageDraw
+
+        image = Image.new("RGB", size, (0, 0, 0))
         draw = ImageDraw.Draw(image)
 
         # # Calculate vertical center of image
@@ -122,7 +134,7 @@ class FileUtils:
         margin = 140  # Increased margin
         max_width = image.width - (2 * margin)
         # increase the font size by 16
-        larger_font = ImageFont.truetype(font.path, font.size + 16)  # pyright: ignore[reportAttributeAccessIssue]
+        larger_font = _truetype(font.path, font.size + 16)  # pyright: ignore[reportAttributeAccessIssue]
         wrapped_text = FileUtils._wrap_text(text=text, font=larger_font, max_width=max_width)
         # Calculate line height with spacing
         line_height = larger_font.size * line_spacing
@@ -148,6 +160,57 @@ class FileUtils:
 
         return image
 
+    @staticmethod
+    def _rounded_rectangle_mask(*, width: int, height: int, radius: int) -> np.ndarray:
+        """Create a single channel mask (0 or 255) of a filled rounded rectangle."""
+        import cv2
+        import numpy as np
+
+        mask = np.zeros((height, width), dtype=np.uint8)
+        radius = max(0, min(radius, (width - 1) // 2, (height - 1) // 2))
+        right, bottom = width - 1, height - 1
+        cv2.rectangle(mask, (radius, 0), (right - radius, bottom), 255, -1)
+        cv2.rectangle(mask, (0, radius), (right, bottom - radius), 255, -1)
+        for center in (
+            (radius, radius),
+            (right - radius, radius),
+            (radius, bottom - radius),
+            (right - radius, bottom - radius),
+        ):
+            cv2.circle(mask, center, radius, 255, -1, lineType=cv2.LINE_AA)
+        return mask
+
+    @staticmethod
+    def _blend_rounded_rectangle(
+        image: Image.Image,
+        bbox: tuple[int, int, int, int],
+        *,
+        radius: int,
+        fill: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        """Alpha blend a filled rounded rectangle into an RGB image in place.
+
+        Only the region covered by `bbox` (inclusive, like `ImageDraw.rounded_rectangle`) is copied out,
+        blended and pasted back.
+        """
+        import numpy as np
+        from PIL import Image
+
+        x0, y0, x1, y1 = (int(value) for value in bbox)
+
+        # Clip the rectangle to the image bounds
+        left, top = max(x0, 0), max(y0, 0)
+        right, bottom = min(x1 + 1, image.width), min(y1 + 1, image.height)
+        if left >= right or top >= bottom:
+            return
+
+        mask = FileUtils._rounded_rectangle_mask(width=x1 - x0 + 1, height=y1 - y0 + 1, radius=radius)
+        roi = np.asarray(image.crop((left, top, right, bottom)), dtype=np.float32)
+        weight = mask[top - y0 : bottom - y0, left - x0 : right - x0, None].astype(np.float32) * (alpha / (255 * 255))
+        blended = roi * (1 - weight) + np.asarray(fill, dtype=np.float32) * weight + 0.5
+        image.paste(Image.fromarray(blended.astype(np.uint8)), (left, top))
+
     @staticmethod
     def _add_overlay_to_image(  # noqa: PLR0913
         *,
@@ -159,9 +222,17 @@ class FileUtils:
         logo: Image.Image | None = None,
     ) -> Image.Image:
         """Add step number and goal overlay to an image."""
-        image = image.convert("RGBA")
-        txt_layer = Image.new("RGBA", image.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(txt_layer)
+        from PIL import ImageDraw
+
+        image = image.convert("RGB")
+
+        # Add logo if provided (top right corner)
+        if logo:
+            logo_margin = 20
+            logo_x = image.width - logo.width - logo_margin
+            image.paste(logo, (logo_x, logo_margin), logo if logo.mode == "RGBA" else None)
+
+        draw = ImageDraw.Draw(image)
 
         # Add step number (bottom left)
         step_text = str(step_number)
@@ -173,7 +244,7 @@ class FileUtils:
         x_step = margin + 10  # Slight additional offset from edge
         y_step = image.height - margin - step_height - 10  # Slight offset from bottom
 
-        # Draw rounded rectangle background for step number
+        # Rounded rectangle background for step number
         padding = 20  # Increased padding
         step_bg_bbox = (
             x_step - padding,
@@ -181,11 +252,8 @@ class FileUtils:
             x_step + step_width + padding,
             y_step + step_height + padding,
         )
-        draw.rounded_rectangle(step_bg_bbox, radius=15, fill=(255, 255, 255, 180))  # White with alpha
-        # Draw step number
-        draw.text((x_step, y_step), step_text, font=font, fill=(0, 0, 0, 255))  # Black text
 
-        # Draw goal text (centered, bottom)
+        # Goal text (centered, bottom)
         max_width = image.width - (4 * margin)
         wrapped_goal = FileUtils._wrap_text(text=goal_text, font=font, max_width=max_width)
         goal_bbox = draw.multiline_textbbox((0, 0), wrapped_goal, font=font)
@@ -196,7 +264,7 @@ class FileUtils:
         x_goal = (image.width - goal_width) // 2
         y_goal = y_step - goal_height - padding * 2  # More space between step and goal
 
-        # Draw rounded rectangle background for goal
+        # Rounded rectangle background for goal
         padding_goal = 20  # Increased padding for goal
         goal_bg_bbox = (
             x_goal - padding_goal,
@@ -204,25 +272,35 @@ class FileUtils:
             x_goal + goal_width + padding_goal,
             y_goal + goal_height + padding_goal,
         )
-        draw.rounded_rectangle(goal_bg_bbox, radius=15, fill=(255, 255, 255, 100))  # White with alpha
 
-        # Draw goal text
-        draw.multiline_text((x_goal, y_goal), wrapped_goal, font=font, fill=(0, 0, 0, 255), align="center")
+        # Blend the translucent white backgrounds, only their regions leave the image
+        FileUtils._blend_rounded_rectangle(image, step_bg_bbox, radius=15, fill=(255, 255, 255), alpha=180)
+        FileUtils._blend_rounded_rectangle(image, goal_bg_bbox, radius=15, fill=(255, 255, 255), alpha=100)
 
-        # Add logo if provided (top right corner)
-        if logo:
-            logo_layer = Image.new("RGBA", image.size, (0, 0, 0, 0))
-            logo_margin = 20
-            logo_x = image.width - logo.width - logo_margin
-            logo_layer.paste(logo, (logo_x, logo_margin), logo if logo.mode == "RGBA" else None)
-            txt_layer = Image.alpha_composite(logo_layer, txt_layer)
+        # Draw the opaque black text on top of the backgrounds
+        draw.text((x_step, y_step), step_text, font=font, fill=(0, 0, 0))
+        draw.multiline_text((x_goal, y_goal), wrapped_goal, font=font, fill=(0, 0, 0), align="center")
+        return image
 
-        # Composite and convert
-        result = Image.alpha_composite(image, txt_layer)
-        return result.convert("RGB")
+    @staticmethod
+    def _image_size(image: bytes) -> tuple[int, int]:
+        """Read the dimensions of an encoded image from its header, without decoding the pixels."""
+        from PIL import Image
+
+        with Image.open(io.BytesIO(image)) as template:
+            return template.size
 
     @staticmethod
+    def _screenshot_bytes(item: AgentHistory) -> bytes | None:
+        """Decode the base64 screenshot of a history item, None if the step has no screenshot."""
+        screenshot = item.state.screenshot
+        return FileUtils.decode_image_from_base64(screenshot) if screenshot else None
+
+    @staticmethod
+    @cache
     def _get_logo() -> Image.Image | None:
+        from PIL import Image
+
         try:
             # TODO(promise): Set logo
             logo = Image.open("./static/mployee.png")
@@ -261,13 +339,43 @@ class FileUtils:
     @staticmethod
     def encode_image_to_base64(image: bytes) -> str:
         """Encode image bytes to a base64 encoded string."""
-        return base64.b64encode(image).decode()
+        return base64.b64encode(image).decode("ascii")
 
     @staticmethod
     def decode_image_from_base64(string: str) -> bytes:
         """Decode a base64 encoded image string to bytes."""
         return base64.b64decode(string)
 
+    @staticmethod
+    def split_image_into_tiles(image: bytes, *, tile_height: int, overlap: int = 0, quality: int = 80) -> list[bytes]:
+        """Split a tall image into JPEG encoded horizontal tiles of at most `tile_height` pixels.
+
+        Consecutive tiles share `overlap` pixels, so a line of text cut by one tile edge is whole in the
+        neighbouring tile. Images that already fit in a single tile are returned unchanged.
+        """
+        from PIL import Image
+
+        if not 0 <= overlap < tile_height:
+            msg = f"overlap must be between 0 and tile_height ({tile_height}), got {overlap}"
+            raise ValueError(msg)
+
+        with Image.open(io.BytesIO(image)) as source:
+            if source.height <= tile_height:
+                return [image]
+            source_rgb = source.convert("RGB")
+
+        tiles = []
+        top = 0
+        while True:
+            bottom = min(top + tile_height, source_rgb.height)
+            tile = source_rgb.crop((0, top, source_rgb.width, bottom))
+            buffer = io.BytesIO()
+            tile.save(buffer, format="JPEG", quality=quality)
+            tiles.append(buffer.getvalue())
+            if bottom == source_rgb.height:
+                return tiles
+            top = bottom - overlap
+
     @staticmethod
     def create_video_from_images(
         *,
@@ -275,22 +383,29 @@ class FileUtils:
         output_path: str,
         fps: int = 1,
     ) -> str | None:
+        import av
+        import numpy as np
+
         try:
             if not images:
                 logger.warning("No images provided to create video")
                 return None
             # Get dimensions from first image
-            height, width = np.array(images[0]).shape[:2]
-
-            # Initialize video writer
-            fourcc = cv2.VideoWriter.fourcc(*"avc1")
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-
-            # Write each frame
-            for image in images:
-                cv2_image = FileUtils._pil_to_cv2(image)
-                out.write(cv2_image)
-            out.release()
+            width, height = images[0].size
+
+            # H.264 with yuv420p needs even dimensions, frames are scaled to the stream size when encoded
+            with av.open(output_path, mode="w") as container:
+                stream = container.add_stream("h264", rate=fps)
+                stream.width = width - width % 2
+                stream.height = height - height % 2
+                stream.pix_fmt = "yuv420p"
+
+                # Write each frame
+                for image in images:
+                    rgb_image = image if image.mode == "RGB" else image.convert("RGB")
+                    frame = av.VideoFrame.from_ndarray(np.asarray(rgb_image), format="rgb24")
+                    container.mux(stream.encode(frame))
+                container.mux(stream.encode())  # Flush buffered packets
         except Exception:
             logger.exception("Failed to create video")
             return None
@@ -303,27 +418,149 @@ class FileUtils:
         output_path: str,
         duration: int,
     ) -> str:
-        images[0].save(
+        from PIL import Image
+
+        # Quantize up front with the fast octree quantizer instead of letting the GIF encoder optimize each frame
+        palette_images = [image.quantize(colors=256, method=Image.Quantize.FASTOCTREE) for image in images]
+        palette_images[0].save(
             output_path,
             save_all=True,
-            append_images=images[1:],
+            append_images=palette_images[1:],
             duration=duration,
             loop=0,
-            optimize=True,
+            optimize=False,
         )
         return output_path
 
     @staticmethod
-    def create_media_from_history_list(  # noqa: C901
+    def get_gif_frame_durations(path: str) -> list[int]:
+        """Return how long each frame of a GIF is shown, in milliseconds."""
+        from PIL import Image, ImageSequence
+
+        with Image.open(path) as gif:
+            return [frame.info.get("duration", 0) for frame in ImageSequence.Iterator(gif)]
+
+    @staticmethod
+    def create_media_with_ffmpeg(
+        *,
+        images: list[Image.Image],
+        filename: str,
+        output_format: list[Literal["gif", "mp4"]],
+        duration: int,
+        fps: int = 1,
+    ) -> HistoryMedia | None:
+        """Encode the frames into every requested format with a single ffmpeg process.
+
+        The raw RGB frames are streamed to ffmpeg once and split inside its filter graph, the GIF is
+        encoded with a generated palette. Returns None if ffmpeg is not installed or the encode fails.
+        """
+        ffmpeg = shutil.which("ffmpeg")
+        if not ffmpeg or not images or not output_format:
+            return None
+
+        width, height = images[0].size
+        video_path = f"{filename}.mp4" if "mp4" in output_format else None
+        gif_path = f"{filename}.gif" if "gif" in output_format else None
+        branches = [label for label, path in (("mp4", video_path), ("gif", gif_path)) if path]
+
+        filters = [f"[0:v]split={len(branches)}" + "".join(f"[{label}]" for label in branches)]
+        outputs: list[str] = []
+        if video_path:
+            # libx264 with yuv420p needs even dimensions
+            filters.append("[mp4]scale=trunc(iw/2)*2:trunc(ih/2)*2,format=yuv420p[mp4_out]")
+            outputs += ["-map", "[mp4_out]", "-c:v", "libx264", video_path]
+        if gif_path:
+            # Stretch the timestamps so every frame lasts `duration` milliseconds
+            filters.append(
+                f"[gif]setpts={duration * fps / 1000}*PTS,split[gif_a][gif_b];"
+                "[gif_a]palettegen=stats_mode=diff[palette];"
+                "[gif_b][palette]paletteuse=dither=bayer[gif_out]",
+            )
+            # setpts only moves the start times, ffmpeg shows the last frame for 10 ms unless it's told otherwise
+            outputs += ["-map", "[gif_out]", "-final_delay", str(duration // 10), gif_path]
+
+        command = [
+            ffmpeg,
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{width}x{height}",
+            "-framerate",
+            str(fps),
+            "-i",
+            "-",
+            "-filter_complex",
+            ";".join(filters),
+            *outputs,
+        ]
+        try:
+            process = subprocess.Popen(  # noqa: S603
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            )
+            assert process.stdin is not None
+            try:
+                for image in images:
+                    frame = image if image.mode == "RGB" else image.convert("RGB")
+                    if frame.size != (width, height):
+                        frame = frame.resize((width, height))
+                    process.stdin.write(frame.tobytes())
+            except BrokenPipeError:
+                pass  # ffmpeg exited early, the error is reported below
+            _, stderr = process.communicate()
+        except Exception:
+            logger.exception("Failed to create media with ffmpeg")
+            return None
+        if process.returncode != 0:
+            logger.error("ffmpeg failed to create media: %s", stderr.decode(errors="replace").strip())
+            return None
+        return HistoryMedia(gif=gif_path, mp4=video_path)
+
+    @staticmethod
+    def _create_history_frames(
         *,
         history_list: AgentHistoryList,
-        screenshots_to_append: list[str | bytes],
+        screenshots: list[bytes | None],
+        font: ImageFont.FreeTypeFont | ImageFont.ImageFont,
+        margin: int,
+        logo: Image.Image | None,
+    ) -> list[Image.Image]:
+        """Open each step's screenshot and draw its overlay, steps without a screenshot are skipped."""
+        from PIL import Image
+
+        frames = []
+        for i, (item, screenshot) in enumerate(zip(history_list.history, screenshots, strict=True), 1):
+            if not screenshot:
+                continue
+            image = Image.open(io.BytesIO(screenshot))
+            if item.model_output:
+                image = FileUtils._add_overlay_to_image(
+                    image=image,
+                    step_number=i,
+                    goal_text=item.model_output.current_state.next_goal or "",
+                    font=font,
+                    margin=margin,
+                    logo=logo,
+                )
+            frames.append(image)
+        return frames
+
+    @staticmethod
+    def create_media_from_history_list(
+        *,
+        history_list: AgentHistoryList,
+        closing_frame_sizes: list[tuple[int, int]],
         filename: str,
         output_format: list[Literal["gif", "mp4"]],
         params: GIFParams | None = None,
     ) -> HistoryMedia | None:
-        images = []
-
         try:
             gif_params = GIFParams(
                 duration=5000,
@@ -347,44 +584,46 @@ class FileUtils:
                 title_font_size=gif_params["title_font_size"],  # pyright: ignore[reportTypedDictNotRequiredAccess]
                 goal_font_size=gif_params["goal_font_size"],  # pyright: ignore[reportTypedDictNotRequiredAccess]
             )
-            images: list[Image.Image] = []
-            images.append(
+            # Decode every screenshot once, the title frame only needs the size of the first one
+            screenshots = [FileUtils._screenshot_bytes(item) for item in history_list.history]
+            title_frame = FileUtils._create_frame(
+                text=gif_params["title_text"],  # pyright: ignore[reportTypedDictNotRequiredAccess]
+                size=FileUtils._image_size(screenshots[0] or b""),
+                font=font["title"],
+                line_spacing=gif_params["line_spacing"],  # pyright: ignore[reportTypedDictNotRequiredAccess]
+                logo=logo,
+            )
+            margin = gif_params["margin"]  # pyright: ignore[reportTypedDictNotRequiredAccess]
+            history_frames = FileUtils._create_history_frames(
+                history_list=history_list,
+                screenshots=screenshots,
+                font=font["title"],
+                margin=margin,
+                logo=logo,
+            )
+            appended_frames = [
                 FileUtils._create_frame(
-                    text=gif_params["title_text"],  # pyright: ignore[reportTypedDictNotRequiredAccess]
-                    screenshot=history_list.history[0].state.screenshot or "",
+                    text="",
+                    size=size,
                     font=font["title"],
                     line_spacing=gif_params["line_spacing"],  # pyright: ignore[reportTypedDictNotRequiredAccess]
                     logo=logo,
-                ),
-            )
-            for i, item in enumerate(history_list.history, 1):
-                if not item.state.screenshot:
-                    continue
-                img_bytes = FileUtils.decode_image_from_base64(item.state.screenshot)
-                image = Image.open(io.BytesIO(img_bytes))
-                if item.model_output:
-                    image = FileUtils._add_overlay_to_image(
-                        image=image,
-                        step_number=i,
-                        goal_text=item.model_output.current_state.next_goal or "",
-                        font=font["title"],
-                        margin=gif_params["margin"],  # pyright: ignore[reportTypedDictNotRequiredAccess]
-                        logo=logo,
-                    )
-                images.append(image)
-            for screenshot in screenshots_to_append:
-                images.append(
-                    FileUtils._create_frame(
-                        text="",
-                        screenshot=FileUtils.encode_image_to_base64(screenshot)
-                        if isinstance(screenshot, bytes)
-                        else screenshot,
-                        font=font["title"],
-                        line_spacing=gif_params["line_spacing"],  # pyright: ignore[reportTypedDictNotRequiredAccess]
-                        logo=logo,
-                    ),
                 )
+                for size in closing_frame_sizes
+            ]
+            images = [title_frame, *history_frames, *appended_frames]
             if images:
+                history_media = FileUtils.create_media_with_ffmpeg(
+                    images=images,
+                    filename=filename,
+                    output_format=output_format,
+                    duration=gif_params["duration"],  # pyright: ignore[reportTypedDictNotRequiredAccess]
+                    fps=1,
+                )
+                if history_media:
+                    return history_media
+
+                # Fall back to encoding each format separately when ffmpeg is unavailable
                 gif_path: str | None = None
                 video_path: str | None = None
 
@@ -406,7 +645,7 @@ class FileUtils:
         filepath = Path(path)
         try:
             if filepath.exists():
-                return json.loads(filepath.read_text(encoding="utf-8"))
+                return orjson.loads(filepath.read_bytes())
         except Exception:
             logger.exception("Failed to read JSON file")
         return None
@@ -428,7 +667,10 @@ class FileUtils:
     def write_data_to_file(path: str, data: Any) -> None:  # noqa: ANN401
         filepath = Path(path)
         filepath.parent.mkdir(parents=True, exist_ok=True)
-        filepath.write_text(json.dumps(data), encoding="utf-8")
+        # Write to a temporary file and swap it in, so readers never see a half written file
+        temp_filepath = filepath.with_name(f"{filepath.name}.tmp")
+        temp_filepath.write_bytes(orjson.dumps(data))
+        temp_filepath.replace(filepath)
 
 
 if __name__ == "__main__":
@@ -437,7 +679,7 @@ if __name__ == "__main__":
     #         "/Users/6ones/Projects/mployee/backend/snippets/agent/history.json",
     #         AgentOutput,
     #     ),
-    #     screenshots_to_append=[],
+    #     closing_frame_sizes=[],
     #     filename="test_file_history",
     #     output_format=["mp4", "gif"],
     # )
@@ -459,4 +701,27 @@ if __name__ == "__main__":
     # ]
     # cookies_file = FileUtils.write_data_to_file("test-cookies.json", data)
     # print(cookies_file)
-    pass
+
+    # Check that both GIF writers show every frame, the last one included, for the configured duration
+    import tempfile
+
+    from PIL import Image
+
+    test_frames = [Image.new("RGB", (64, 48), color) for color in ("red", "green", "blue", "white")]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ffmpeg_media = FileUtils.create_media_with_ffmpeg(
+            images=test_frames,
+            filename=f"{temp_dir}/ffmpeg",
+            output_format=["gif"],
+            duration=5000,
+        )
+        fallback_gif = FileUtils.create_gif_from_images(
+            images=test_frames,
+            output_path=f"{temp_dir}/fallback.gif",
+            duration=5000,
+        )
+        for gif_path in (ffmpeg_media and ffmpeg_media["gif"], fallback_gif):
+            if gif_path:
+                frame_durations = FileUtils.get_gif_frame_durations(gif_path)
+                print(gif_path, frame_durations)  # noqa: T201
+                assert frame_durations == [5000] * len(test_frames), frame_durations
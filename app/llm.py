@@ -1,9 +1,11 @@
 import asyncio
+from functools import lru_cache
 from typing import TYPE_CHECKING, cast
 
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
+from pydantic import BaseModel
 
 from app.files import FileUtils
 from app.logger import base_logger
@@ -12,51 +14,125 @@ from app.model_types import AnthropicModelName, ModelProviders, OpenAIModelName
 if TYPE_CHECKING:
     from langchain_core.language_models.chat_models import BaseChatModel
 
+logger = base_logger.getChild(__name__)
+
+
+@lru_cache(maxsize=8)
+def _get_chat_model(provider: ModelProviders, model_name: str) -> "BaseChatModel":
+    """Create a chat model client once per provider and model so its HTTP connection pool is reused."""
+    if provider == ModelProviders.OPENAI:
+        return ChatOpenAI(model=model_name)
+    return ChatAnthropic(model=model_name)  # pyright: ignore[reportCallIssue]
+
 
 class LLMModel:
     def __init__(self, *, model_name: OpenAIModelName | AnthropicModelName) -> None:
         """Initialize the LLM model."""
         self.logger = base_logger.getChild(self.__class__.__name__)
 
-        model: BaseChatModel
-        provider: str
+        provider: ModelProviders
 
         if isinstance(model_name, OpenAIModelName):
             provider = ModelProviders.OPENAI
-            model = ChatOpenAI(model=model_name)
         elif isinstance(model_name, AnthropicModelName):
             provider = ModelProviders.ANTHROPIC
-            model = ChatAnthropic(model=model_name)  # pyright: ignore[reportCallIssue]
         else:
             msg = f"Model name {model_name} is not a supported model type"
             self.logger.error(msg)
             raise TypeError(msg)
 
         self.llm_model_configuration = {"provider": provider, "model": model_name}
-        self.model = model
+        self.model = _get_chat_model(provider, model_name)
 
     async def call(self, *, messages: list[HumanMessage]) -> str | list[str | dict]:
         response = await self.model.ainvoke(messages)
         return response.content
 
+    async def batch_call_structured(
+        self,
+        *,
+        batches: list[list[HumanMessage]],
+        schema: type[BaseModel] | dict,
+        max_concurrency: int = 32,
+    ) -> list[dict | BaseModel]:
+        """Run a structured output call for each list of messages concurrently.
+
+        Args:
+            batches (list[list[HumanMessage]]): Message lists, each one is sent as a separate request.
+            schema (type[BaseModel] | dict): Output schema passed to `with_structured_output`.
+            max_concurrency (int, optional): Maximum number of concurrent requests. Defaults to 32.
+
+        Returns:
+            list[dict | BaseModel]: Structured outputs in the order of `batches`.
+
+        """
+        structured_model = self.model.with_structured_output(schema)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _call(messages: list[HumanMessage]) -> dict | BaseModel:
+            async with semaphore:
+                return cast(dict | BaseModel, await structured_model.ainvoke(messages))
+
+        return await asyncio.gather(*(_call(messages) for messages in batches))
+
     @classmethod
-    async def do_ocr(cls, *, images: list[str], prompt: str | None = None) -> str:
+    async def do_ocr(
+        cls,
+        *,
+        images: list[str],
+        prompt: str | None = None,
+        chunk_size: int | None = None,
+        max_concurrent_requests: int = 4,
+    ) -> str:
         """Method for OCR processing of images.
 
+        By default all images are sent in a single request, so the model sees the whole page and can
+        merge text that runs across images. With `chunk_size` the images are split into chunks that are
+        sent as separate, concurrent requests.
+
         Args:
             images (list[str]): List of base64 encoded images.
             prompt (str | None, optional): Prompt for the OCR model. Defaults to "Perform OCR on the following images and extract the text content.".
+            chunk_size (int | None, optional): Number of images sent per request. Defaults to all images in one request.
+            max_concurrent_requests (int, optional): Maximum number of chunks in flight at once. Defaults to 4.
 
         Returns:
-            str: Extracted text content from the images.
+            str: Extracted text content from the images, in the order of the images. A chunk whose request
+                failed is replaced by an "[OCR failed for image N]" marker.
 
         """
         if prompt is None:
             prompt = "Perform OCR on the following images and extract the text content."
-        llm_model = cls(ocr=True)
-        image_data = [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img}"}} for img in images]
-        message = HumanMessage(content=[{"type": "text", "text": prompt}, *image_data])
-        return cast(str, await llm_model.call(messages=[message]))
+        if chunk_size is None:
+            chunk_size = max(len(images), 1)
+        llm_model = cls(model_name=OpenAIModelName.GPT_4O)
+        semaphore = asyncio.Semaphore(max_concurrent_requests)
+
+        async def _ocr_chunk(chunk: list[str]) -> str:
+            image_data = [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img}"}} for img in chunk]
+            message = HumanMessage(content=[{"type": "text", "text": prompt}, *image_data])
+            async with semaphore:
+                return cast(str, await llm_model.call(messages=[message]))
+
+        starts = range(0, len(images), chunk_size)
+        results = await asyncio.gather(
+            *(_ocr_chunk(images[i : i + chunk_size]) for i in starts),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors and len(errors) == len(results):
+            raise errors[0]
+
+        texts = []
+        for start, result in zip(starts, results, strict=True):
+            if isinstance(result, BaseException):
+                logger.error("OCR request failed: %s", result)
+                end = min(start + chunk_size, len(images))
+                image_numbers = f"{start + 1}" if end - start == 1 else f"{start + 1}-{end}"
+                texts.append(f"[OCR failed for image {image_numbers}]")
+            else:
+                texts.append(result)
+        return "\n\n".join(texts)
 
 
 if __name__ == "__main__":
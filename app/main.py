@@ -1,9 +1,22 @@
-import asyncio
 import json
 
-from app.agent.main import WebExplorerAgent
+from app.agent.main import Output, WebExplorerAgent
 from app.logger import base_logger
 
+try:
+    from uvloop import run as run_event_loop
+except ImportError:  # uvloop doesn't support Windows, fall back to the default asyncio event loop
+    from asyncio import run as run_event_loop
+
+
+async def main(*, prompt: str, title: str, instruction: str) -> Output:
+    agent = WebExplorerAgent()
+    try:
+        return await agent.run(prompt=prompt, title=title, instruction=instruction)
+    finally:
+        await WebExplorerAgent.close_browser_pool()
+
+
 if __name__ == "__main__":
     logger = base_logger.getChild(__name__)
 
@@ -11,8 +24,7 @@ if __name__ == "__main__":
     title = ""
     instruction = ""
 
-    agent = WebExplorerAgent()
-    output = asyncio.run(
-        agent.run(prompt=prompt, title=title, instruction=instruction),
+    output = run_event_loop(
+        main(prompt=prompt, title=title, instruction=instruction),
     )
     logger.info(json.dumps(output, indent=4))
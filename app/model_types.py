@@ -11,9 +11,9 @@ class HuggingFaceModelName(StrEnum):
 
 
 class AnthropicModelName(StrEnum):
-    CLAUDE_3_5_LATEST = "claude-3-5-sonnet-20241022"
     CLAUDE_3_5_SONNET_2024_10_22 = "claude-3-5-sonnet-20241022"
     CLAUDE_3_5_SONNET_2024_06_20 = "claude-3-5-sonnet-20240620"
+    CLAUDE_3_5_LATEST = CLAUDE_3_5_SONNET_2024_10_22  # alias, update when a newer sonnet is added
 
 
 class OpenAIModelName(StrEnum):
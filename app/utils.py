@@ -1,2 +1,12 @@
-def chunkify(s: str, chunk_size: int) -> list[str]:
-    return [s[i : i + chunk_size] for i in range(0, len(s), chunk_size)]
+from collections.abc import Iterator
+
+
+def chunkify(s: str, chunk_size: int) -> Iterator[str]:
+    for i in range(0, len(s), chunk_size):
+        yield s[i : i + chunk_size]
+
+
+def chunkify_bytes(data: bytes, chunk_size: int) -> Iterator[memoryview]:
+    view = memoryview(data)
+    for i in range(0, len(view), chunk_size):
+        yield view[i : i + chunk_size]